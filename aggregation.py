@@ -0,0 +1,184 @@
+from collections import Counter
+
+import numpy as np
+
+COMPARTMENTS = ('infected', 'dead', 'immune', 'susceptible')
+
+
+class ReplicateAggregator:
+    """
+    Aggregates the daily results of many simulation runs without keeping the runs.
+
+    Means and standard deviations are updated with Welford's algorithm and the final
+    deaths are counted per value. The first `buffer_size` runs are kept, so quantiles
+    are exact (`np.quantile`) for that many runs. Once the buffer is full it seeds the
+    P² algorithm (five markers per quantile, day and compartment), which estimates the
+    quantiles of all further runs. Memory therefore depends on the number of days and
+    the buffer size but not on the number of runs.
+
+    Attributes:
+        quantiles (tuple): Tracked quantiles, e.g. 0.05 for the 5th percentile.
+        buffer_size (int): Number of runs for which the quantiles are exact.
+        count (int): Number of runs added so far.
+        final_dead (Counter): Number of runs per final death count.
+    """
+
+    def __init__(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), buffer_size=200):
+        if buffer_size < 5:
+            raise ValueError("The buffer must hold at least 5 runs to seed the P² markers")
+        self.quantiles = tuple(quantiles)
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.final_dead = Counter()
+        self.days = None
+        self._mean = None
+        self._m2 = None
+
+        # P² markers: heights and positions per (quantile, compartment, day, marker)
+        p = np.array(self.quantiles)[:, None]
+        self._increments = np.hstack([np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p)])
+        self._buffer = []
+        self._heights = None
+        self._positions = None
+        self._desired = None
+
+    def add(self, results):
+        """
+        Adds one run.
+
+        Args:
+            results (dict): Daily outcomes as returned by `simulate_epidemic`.
+        """
+        values = np.array([results[compartment] for compartment in COMPARTMENTS], dtype=float)
+        if self.days is None:
+            self.days = list(results['day'])
+            self._mean = np.zeros_like(values)
+            self._m2 = np.zeros_like(values)
+        elif values.shape != self._mean.shape:
+            raise ValueError(f"Expected {len(self.days)} days, got {values.shape[1]}")
+
+        self.count += 1
+        delta = values - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (values - self._mean)
+
+        self.final_dead[int(values[1, -1])] += 1
+        self._update_quantiles(values)
+
+    def add_all(self, runs):
+        """
+        Adds several runs, e.g. a batch from `simulate_epidemic_batch`.
+
+        Args:
+            runs (iterable): Results dicts, consumed one at a time.
+        """
+        for results in runs:
+            self.add(results)
+
+    def _seed_markers(self):
+        # Place the markers at the buffered order statistics closest to their desired positions
+        n = len(self._buffer)
+        ordered = np.sort(np.stack(self._buffer, axis=-1), axis=-1)
+        self._desired = 1 + (n - 1) * self._increments
+        positions = np.round(self._desired)
+        for i in (1, 2, 3):
+            positions[:, i] = np.clip(positions[:, i], positions[:, i - 1] + 1, n - 4 + i)
+
+        heights = ordered[..., positions.astype(int) - 1]
+        self._heights = np.moveaxis(heights, 2, 0).copy()
+        self._positions = np.broadcast_to(positions[:, None, None, :], self._heights.shape).copy()
+        self._buffer = []
+
+    def _update_quantiles(self, values):
+        if self._heights is None:
+            if len(self._buffer) < self.buffer_size:
+                self._buffer.append(values)
+                return
+            self._seed_markers()
+
+        heights, positions = self._heights, self._positions
+        x = np.broadcast_to(values, heights.shape[:-1])
+
+        # Adjust the extreme markers and find the cell k with heights[k] <= x < heights[k + 1]
+        heights[..., 0] = np.minimum(heights[..., 0], x)
+        heights[..., 4] = np.maximum(heights[..., 4], x)
+        k = np.clip((x[..., None] >= heights[..., 1:4]).sum(axis=-1), 0, 3)
+        positions += np.arange(5) > k[..., None]
+        self._desired = self._desired + self._increments
+        desired = self._desired[:, None, None, :]
+
+        for i in (1, 2, 3):
+            d = desired[..., i] - positions[..., i]
+            move = ((d >= 1) & (positions[..., i + 1] - positions[..., i] > 1)) | \
+                   ((d <= -1) & (positions[..., i - 1] - positions[..., i] < -1))
+            if not move.any(): continue
+            d = np.sign(d) * move
+
+            n_low, n, n_high = positions[..., i - 1], positions[..., i], positions[..., i + 1]
+            q_low, q, q_high = heights[..., i - 1], heights[..., i], heights[..., i + 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = q + d / (n_high - n_low) * (
+                    (n - n_low + d) * (q_high - q) / (n_high - n) + (n_high - n - d) * (q - q_low) / (n - n_low)
+                )
+                neighbour_q = np.where(d > 0, q_high, q_low)
+                neighbour_n = np.where(d > 0, n_high, n_low)
+                linear = q + d * (neighbour_q - q) / (neighbour_n - n)
+            use_parabolic = (q_low < parabolic) & (parabolic < q_high)
+            heights[..., i] = np.where(move, np.where(use_parabolic, parabolic, linear), q)
+            positions[..., i] = n + d
+
+    def _check(self):
+        if self.count == 0:
+            raise ValueError("No runs have been added")
+
+    def mean(self, compartment):
+        """
+        Returns:
+            np.ndarray: Daily mean of the compartment ('infected', 'dead', 'immune', 'susceptible').
+        """
+        self._check()
+        return self._mean[COMPARTMENTS.index(compartment)].copy()
+
+    def std(self, compartment):
+        """
+        Returns:
+            np.ndarray: Daily standard deviation of the compartment (like `np.std`, ddof=0).
+        """
+        self._check()
+        return np.sqrt(self._m2[COMPARTMENTS.index(compartment)] / self.count)
+
+    def quantile(self, compartment, q):
+        """
+        Returns the daily value of a tracked quantile, exact for up to `buffer_size` runs
+        and a P² estimate after that.
+
+        Args:
+            compartment (str): One of 'infected', 'dead', 'immune', 'susceptible'.
+            q (float): One of `quantiles`.
+
+        Returns:
+            np.ndarray: Daily value of the quantile.
+        """
+        self._check()
+        if q not in self.quantiles:
+            raise KeyError(f"Quantile {q} is not tracked, use one of {self.quantiles}")
+        row = COMPARTMENTS.index(compartment)
+        if self._heights is None:
+            return np.quantile(np.stack(self._buffer)[:, row], q, axis=0)
+        return self._heights[self.quantiles.index(q), row, :, 2].copy()
+
+    def final_dead_distribution(self):
+        """
+        Returns:
+            tuple: Sorted final death counts and the number of runs for each of them.
+        """
+        values = sorted(self.final_dead)
+        return np.array(values), np.array([self.final_dead[value] for value in values])
+
+    def mean_final_dead(self):
+        """
+        Returns:
+            float: Mean number of deaths on the last day.
+        """
+        self._check()
+        return self._mean[1, -1]
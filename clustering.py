@@ -0,0 +1,163 @@
+import numpy as np
+
+from experiment import concert_prob_per_day
+from vaccination import attendence_prob
+
+
+def effective_contact_weights(index, concert_prob=concert_prob_per_day, attendence_prob=attendence_prob):
+    """
+    Weights every friendship by the daily chance that the two friends meet at a concert.
+
+    The weight of a friendship is the sum over the genres both friends like of
+    `concert_prob[genre] * attendence_prob[(True, True)]`. The preferences are combined
+    byte by byte on the packed matrix with a lookup table per byte, so the cost is
+    linear in the number of friendships.
+
+    Args:
+        index (GraphIndex): Social graph as built by `load_graph_index` or `open_graph_store`.
+        concert_prob (dict): Probability of a concert happening per genre.
+        attendence_prob (dict): Probability of friends attending concerts based on preferences.
+
+    Returns:
+        np.ndarray: One weight per CSR entry of the index (aligned with `index.indices`).
+    """
+    genre_weights = np.array([concert_prob.get(genre, 0) for genre in index.genres]) * attendence_prob[(True, True)]
+    genre_weights = np.pad(genre_weights, (0, 8 * index.packed_preferences.shape[1] - len(genre_weights)))
+
+    # table[byte, value] is the weight of the genres set in `value` for that byte
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(float)
+    tables = bits @ genre_weights.reshape(-1, 8).T
+
+    sources, targets = index.sources, np.asarray(index.indices)
+    weights = np.zeros(len(targets))
+    for byte in range(index.packed_preferences.shape[1]):
+        column = index.packed_preferences[:, byte]
+        weights += tables[column[sources] & column[targets], byte]
+    return weights
+
+
+def label_propagation(index, weights, max_iter=50, tol=1e-3, seed=None):
+    """
+    Detects communities with weighted label propagation over the CSR arrays.
+
+    Each node repeatedly adopts the label with the largest total weight among its
+    friends and keeps its own label on ties. In every iteration only a random half of
+    the nodes is updated, which avoids the oscillations of fully synchronous updates
+    while keeping every step vectorised. Each iteration is a sort of the friendships,
+    so the cost is close to linear in their number.
+
+    Args:
+        index (GraphIndex): Social graph.
+        weights (np.ndarray): Weight per CSR entry, see `effective_contact_weights`.
+            Friendships with zero weight are ignored.
+        max_iter (int): Maximum number of iterations.
+        tol (float): Stop once fewer than this fraction of the nodes change their label.
+        seed (int): Seed of the random number generator (used for ties and update order).
+
+    Returns:
+        np.ndarray: Community label per node position, numbered from 0.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(index)
+    mask = weights > 0
+    sources, targets, weights = index.sources[mask], np.asarray(index.indices)[mask], weights[mask]
+
+    labels = np.arange(n)
+    for _ in range(max_iter):
+        # Total weight per (node, neighbour label), sorted by node
+        keys = sources * n + labels[targets]
+        order = np.argsort(keys)
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        totals = np.add.reduceat(weights[order], starts)
+        nodes, candidates = keys[starts] // n, keys[starts] % n
+
+        # Best label per node, a node keeps its label on ties, other ties are broken at random
+        totals *= 1 + 1e-9 * (rng.random(len(totals)) + (candidates == labels[nodes]))
+        node_starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+        best = np.repeat(np.maximum.reduceat(totals, node_starts), np.diff(np.r_[node_starts, len(nodes)]))
+        best_nodes, best_labels = nodes[totals == best], candidates[totals == best]
+
+        update = rng.random(len(best_nodes)) < 0.5
+        changed = np.count_nonzero(labels[best_nodes[update]] != best_labels[update])
+        labels[best_nodes[update]] = best_labels[update]
+        if changed < tol * n: break
+
+    return np.unique(labels, return_inverse=True)[1]
+
+
+def cluster_risk(index, labels, weights):
+    """
+    Rates each community by the total weight of the friendships inside it, i.e. the
+    expected number of daily concert contacts among its members.
+
+    Args:
+        index (GraphIndex): Social graph.
+        labels (np.ndarray): Community label per node position.
+        weights (np.ndarray): Weight per CSR entry, see `effective_contact_weights`.
+
+    Returns:
+        np.ndarray: Risk per community label.
+    """
+    sources = index.sources
+    internal = labels[sources] == labels[np.asarray(index.indices)]
+    # Every friendship appears twice in the CSR arrays
+    return np.bincount(labels[sources[internal]], weights=weights[internal], minlength=labels.max() + 1) / 2
+
+
+def bridge_scores(index, labels, weights, high_risk):
+    """
+    Scores nodes by the weight of their friendships into other high-risk communities.
+
+    Args:
+        index (GraphIndex): Social graph.
+        labels (np.ndarray): Community label per node position.
+        weights (np.ndarray): Weight per CSR entry, see `effective_contact_weights`.
+        high_risk (np.ndarray): Boolean per community label.
+
+    Returns:
+        np.ndarray: Bridge score per node position, zero for nodes that connect no two
+            high-risk communities.
+    """
+    sources, targets = index.sources, np.asarray(index.indices)
+    source_labels, target_labels = labels[sources], labels[targets]
+    bridging = high_risk[source_labels] & high_risk[target_labels] & (source_labels != target_labels)
+    return np.bincount(sources[bridging], weights=weights[bridging], minlength=len(index))
+
+
+def select_cluster_bridges(
+    index, budget, concert_prob=concert_prob_per_day, attendence_prob=attendence_prob, high_risk_clusters=100,
+    seed=None
+):
+    """
+    Selects vaccine candidates among the bridges between high-risk preference clusters.
+
+    Friends that share the preferences of frequent concerts form clusters of frequent
+    contacts. Vaccinating the people that connect the riskiest clusters keeps an
+    outbreak from spreading from one cluster to the next. If there are fewer bridge
+    nodes than the budget, the remaining doses go to the nodes with the highest total
+    contact weight.
+
+    Args:
+        index (GraphIndex): Social graph.
+        budget (int): Number of vaccine candidates.
+        concert_prob (dict): Probability of a concert happening per genre.
+        attendence_prob (dict): Probability of friends attending concerts based on preferences.
+        high_risk_clusters (int): Number of riskiest clusters considered.
+        seed (int): Seed of the community detection.
+
+    Returns:
+        list: IDs of the selected vaccine candidates.
+    """
+    weights = effective_contact_weights(index, concert_prob, attendence_prob)
+    labels = label_propagation(index, weights, seed=seed)
+
+    risk = cluster_risk(index, labels, weights)
+    high_risk = np.zeros(len(risk), dtype=bool)
+    high_risk[np.argsort(risk)[::-1][:high_risk_clusters]] = True
+
+    bridges = bridge_scores(index, labels, weights, high_risk)
+    strength = np.bincount(index.sources, weights=weights, minlength=len(index))
+    # Bridges first (by bridge score), then everyone else by contact strength
+    order = np.lexsort((-strength, -bridges))
+    return index.nodes[order[:budget]].tolist()
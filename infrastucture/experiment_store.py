@@ -0,0 +1,345 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from simulation import simulate_epidemic
+from vaccination import normalize_vaccine_candidates, validate_vaccine_candidates
+
+RESULT_KEYS = ('day', 'infected', 'dead', 'immune', 'susceptible')
+
+
+def graph_fingerprint(G):
+    """
+    Computes a stable hash of a social graph snapshot.
+
+    The hash covers the node IDs in iteration order, the friendships and the preferences
+    of every node. `simulate_epidemic` follows the iteration order when it picks the
+    initially infected and loops over concert attendees. Two graphs with the same data
+    but a different insertion order therefore get different fingerprints. Graphs built
+    by `build_social_graph` from the same data files share one. Computing it walks the
+    whole graph, so compute it once and pass it to `ExperimentStore.simulate` when
+    running many simulations on the same graph.
+
+    :param G: The networkx graph (with the 'preferences' node attribute).
+    :return: The hex digest identifying the graph.
+    """
+    digest = hashlib.sha256()
+
+    nodes = [int(node) for node in G.nodes]
+    digest.update(np.asarray(nodes, dtype=np.int64).tobytes())
+
+    edges = sorted((min(int(u), int(v)), max(int(u), int(v))) for u, v in G.edges)
+    digest.update(np.asarray(edges, dtype=np.int64).tobytes())
+
+    for node in nodes:
+        preferences = G.nodes[node].get('preferences', {})
+        digest.update(json.dumps(sorted(preferences.items())).encode())
+
+    return digest.hexdigest()
+
+
+def _hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def candidates_key(vaccine_candidates, valid_ids=None):
+    """
+    Hashes a set of vaccine candidates independently of their order.
+
+    The candidates are normalized and validated first (see `normalize_vaccine_candidates`
+    and `validate_vaccine_candidates`), so a key only covers IDs that actually get
+    vaccinated.
+
+    :param vaccine_candidates: Iterable of user IDs (or `User` objects).
+    :param valid_ids: IDs that exist, e.g. the social graph. Not checked if None.
+    :return: The hex digest identifying the candidate set.
+    :raises ValueError: If the candidates are not integers, unknown or duplicated.
+    """
+    vaccine_candidates = normalize_vaccine_candidates(vaccine_candidates)
+    validate_vaccine_candidates(vaccine_candidates, valid_ids=valid_ids)
+    return _hash(np.sort(vaccine_candidates).tolist())
+
+
+def parameters_key(concert_prob, attendence_prob):
+    """
+    Hashes the transmission parameters of a simulation.
+
+    :param concert_prob: Probability of a concert happening per genre.
+    :param attendence_prob: Probability of friends attending concerts based on preferences.
+    :return: The hex digest identifying the parameters.
+    """
+    return _hash({
+        'concert_prob': sorted(concert_prob.items()),
+        'attendence_prob': sorted((str(key), value) for key, value in attendence_prob.items()),
+    })
+
+
+def simulation_key(graph, candidates, parameters, days, initial_infected, seed):
+    """
+    Combines the individual hashes into the key of a single simulation run.
+
+    :return: The hex digest under which the run is stored.
+    """
+    return _hash([graph, candidates, parameters, int(days), int(initial_infected), int(seed)])
+
+
+class ExperimentStore:
+    """
+    This class caches the results of epidemic simulations on disk.
+
+    Every run is keyed by the graph snapshot, the sorted candidate IDs, the transmission
+    parameters, the number of days, the number of initially infected and the seed. The
+    daily curves are stored as compressed NPZ blobs while a SQLite index keeps the key,
+    a summary of the run and its last access time. Strategy labels live in a separate
+    table, so the same run (e.g. no vaccination with a given seed) can count for several
+    strategies. Once the blobs exceed `max_bytes` the least recently used runs are
+    evicted.
+
+    :ivar path: Directory holding the SQLite index and the blobs.
+    :ivar max_bytes: Upper bound for the total size of the stored blobs.
+    """
+
+    def __init__(self, path="experiment_store", max_bytes=512 * 1024 ** 2):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, "blobs"), exist_ok=True)
+
+        self.connection = sqlite3.connect(os.path.join(path, "index.sqlite"))
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                key TEXT PRIMARY KEY,
+                graph TEXT NOT NULL,
+                candidates TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                days INTEGER NOT NULL,
+                initial_infected INTEGER NOT NULL,
+                seed INTEGER NOT NULL,
+                final_dead INTEGER NOT NULL,
+                final_immune INTEGER NOT NULL,
+                final_susceptible INTEGER NOT NULL,
+                peak_infected INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS labels (
+                key TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                PRIMARY KEY (key, strategy)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def _blob_path(self, key):
+        return os.path.join(self.path, "blobs", f"{key}.npz")
+
+    def __contains__(self, key):
+        row = self.connection.execute("SELECT 1 FROM runs WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def total_bytes(self):
+        """
+        :return: The total size of all stored blobs in bytes.
+        """
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM runs").fetchone()[0]
+
+    def get(self, key):
+        """
+        Loads a stored run and marks it as recently used.
+
+        :param key: The simulation key (see `simulation_key`).
+        :return: The results dict as returned by `simulate_epidemic` or None if the run
+            is not stored.
+        """
+        if key not in self: return None
+
+        try:
+            with np.load(self._blob_path(key)) as blob:
+                results = {name: blob[name].tolist() for name in RESULT_KEYS}
+        except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+            # The blob vanished or is corrupt, forget about the run
+            self.delete(key)
+            return None
+
+        self.connection.execute("UPDATE runs SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        return results
+
+    def put(self, key, results, graph, candidates, parameters, days, initial_infected, seed, strategy=None):
+        """
+        Stores the results of a run and evicts the least recently used runs if the store
+        grew beyond `max_bytes`.
+
+        :param key: The simulation key (see `simulation_key`).
+        :param results: The results dict as returned by `simulate_epidemic`.
+        :param strategy: Optional label used to compare strategies with `compare`.
+        """
+        # Write to a temporary file first, so a half-written blob is never visible
+        blob_path = self._blob_path(key)
+        temp_path = f"{blob_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as blob_file:
+            np.savez_compressed(blob_file, **{name: np.asarray(results[name], dtype=np.int64) for name in RESULT_KEYS})
+        os.replace(temp_path, blob_path)
+
+        now = time.time()
+        self.connection.execute(
+            """
+            INSERT OR REPLACE INTO runs (
+                key, graph, candidates, parameters, days, initial_infected, seed, final_dead, final_immune,
+                final_susceptible, peak_infected, size, created, last_access
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                key, graph, candidates, parameters, int(days), int(initial_infected), int(seed),
+                int(results['dead'][-1]) if results['dead'] else 0,
+                int(results['immune'][-1]) if results['immune'] else 0,
+                int(results['susceptible'][-1]) if results['susceptible'] else 0,
+                int(max(results['infected'], default=0)),
+                os.path.getsize(blob_path), now, now,
+            )
+        )
+        self.label(key, strategy)
+        self.connection.commit()
+        self.evict(keep=key)
+
+    def label(self, key, strategy):
+        """
+        Adds a strategy label to a stored run, labels that are already set are kept.
+
+        :param key: The simulation key (see `simulation_key`).
+        :param strategy: The label, nothing happens if it is None.
+        """
+        if strategy is None: return
+        self.connection.execute("INSERT OR IGNORE INTO labels VALUES (?, ?)", (key, strategy))
+        self.connection.commit()
+
+    def delete(self, key):
+        """
+        Removes a run from the index and deletes its blob.
+
+        :param key: The simulation key (see `simulation_key`).
+        """
+        self.connection.execute("DELETE FROM runs WHERE key = ?", (key,))
+        self.connection.execute("DELETE FROM labels WHERE key = ?", (key,))
+        self.connection.commit()
+        if os.path.exists(self._blob_path(key)):
+            os.remove(self._blob_path(key))
+
+    def evict(self, keep=None):
+        """
+        Deletes the least recently used runs until the blobs fit into `max_bytes`.
+
+        :param keep: Optional key that is never evicted (e.g. the run just stored).
+        """
+        total = self.total_bytes()
+        rows = self.connection.execute("SELECT key, size FROM runs ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes: break
+            if key == keep: continue
+            self.delete(key)
+            total -= size
+
+    def simulate(
+        self, G, vaccine_candidates, concert_prob, attendence_prob, days=14, initial_infected=10, seed=0,
+        strategy=None, graph=None
+    ):
+        """
+        Runs `simulate_epidemic` with a fixed seed unless the run is already stored.
+
+        The seeding matches `run_simulation_with_seed` from the notebooks, so stored runs
+        are identical to the ones computed there on a graph with the same fingerprint
+        (see `graph_fingerprint`). The candidates must be known, unique integer IDs. A
+        stored run keeps its labels, `strategy` is added to them.
+
+        :param G: The social graph.
+        :param vaccine_candidates: IDs of the vaccinated individuals.
+        :param concert_prob: Probability of a concert happening per genre.
+        :param attendence_prob: Probability of friends attending concerts based on preferences.
+        :param days: Number of days to simulate.
+        :param initial_infected: Number of individuals to start as infected.
+        :param seed: Seed of the random number generators.
+        :param strategy: Optional label used to compare strategies with `compare`.
+        :param graph: Precomputed `graph_fingerprint(G)`, computed if not given.
+        :return: The results dict as returned by `simulate_epidemic`.
+        :raises ValueError: If the candidates are invalid, see `candidates_key`.
+        """
+        if graph is None:
+            graph = graph_fingerprint(G)
+        vaccine_candidates = normalize_vaccine_candidates(vaccine_candidates)
+        candidates = candidates_key(vaccine_candidates, valid_ids=G)
+        parameters = parameters_key(concert_prob, attendence_prob)
+        key = simulation_key(graph, candidates, parameters, days, initial_infected, seed)
+
+        results = self.get(key)
+        if results is not None:
+            self.label(key, strategy)
+            return results
+
+        random.seed(seed)
+        np.random.seed(seed)
+        results = simulate_epidemic(
+            G, vaccine_candidates.tolist(), concert_prob, attendence_prob, days=days, initial_infected=initial_infected
+        )
+        self.put(key, results, graph, candidates, parameters, days, initial_infected, seed, strategy=strategy)
+        return results
+
+    def runs(self, strategy=None):
+        """
+        Lists the stored runs without loading their blobs.
+
+        :param strategy: Optional label to restrict the listing to one strategy.
+        :return: A pandas DataFrame with one row per stored run and label in the
+            'strategy' column, unlabelled runs appear once with an empty label.
+        """
+        query = "SELECT runs.*, labels.strategy FROM runs LEFT JOIN labels ON labels.key = runs.key"
+        params = ()
+        if strategy is not None:
+            query += " WHERE labels.strategy = ?"
+            params = (strategy,)
+        return pd.read_sql_query(query + " ORDER BY runs.created", self.connection, params=params)
+
+    def compare(self, strategies=None):
+        """
+        Compares the stored strategies without re-simulating them.
+
+        Runs are grouped by strategy label and by the simulation setup (graph, parameters,
+        days and initial infected), so only comparable runs are summarised together.
+
+        :param strategies: Optional list of strategy labels to compare, all labelled runs
+            otherwise.
+        :return: A pandas DataFrame with the number of runs and the mean, std, min and max
+            of the final deaths plus the mean peak of infections per group.
+        """
+        runs = self.runs()
+        runs = runs[runs['strategy'].notna()]
+        if strategies is not None:
+            runs = runs[runs['strategy'].isin(strategies)]
+
+        summary = runs.groupby(['strategy', 'graph', 'parameters', 'days', 'initial_infected']).agg(
+            runs=('seed', 'count'),
+            mean_dead=('final_dead', 'mean'),
+            std_dead=('final_dead', 'std'),
+            min_dead=('final_dead', 'min'),
+            max_dead=('final_dead', 'max'),
+            mean_peak_infected=('peak_infected', 'mean'),
+        )
+        return summary.reset_index().sort_values('mean_dead', ignore_index=True)
+
+    def close(self):
+        self.connection.close()
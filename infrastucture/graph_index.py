@@ -0,0 +1,185 @@
+import json
+
+import numpy as np
+
+from experiment import concert_prob_per_day
+
+
+class GraphIndex:
+    """
+    This class holds the social graph as flat NumPy arrays.
+
+    Nodes are addressed by their position in the sorted `nodes` array. The friendships
+    are stored in compressed sparse row (CSR) form: the neighbours of the node at
+    position i are `indices[indptr[i]:indptr[i + 1]]`, sorted by position. The preferences
+    are a bit-packed matrix with one row per node and one bit per genre.
+
+    The index is built once and can then be shared by any number of simulations, e.g.
+    all scenarios and replicates of a sweep.
+
+    :ivar nodes: Sorted user IDs (int64).
+    :ivar indptr: CSR row pointers, length len(nodes) + 1.
+    :ivar indices: CSR column indices (node positions), every friendship appears twice.
+    :ivar degree: Number of friends per node.
+    :ivar packed_preferences: Preferences packed with `np.packbits` along the genres.
+    :ivar genres: List of music genres (in the order of the preference columns).
+    """
+
+    def __init__(self, nodes, indptr, indices, preferences, genres, degree=None, sources=None):
+        """
+        :param preferences: Boolean matrix of shape (len(nodes), len(genres)) or the
+            already packed uint8 matrix.
+        :param sources: Precomputed `sources`, computed on first use if not given.
+        """
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        if preferences.dtype == bool:
+            preferences = np.packbits(preferences, axis=1)
+        self.packed_preferences = preferences
+        self.genres = list(genres)
+        self.degree = np.diff(indptr) if degree is None else degree
+        self._sources = sources
+        self._genre_edges = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def preferences(self):
+        """
+        :return: The unpacked boolean preference matrix (a copy).
+        """
+        return np.unpackbits(self.packed_preferences, axis=1, count=len(self.genres)).astype(bool)
+
+    def likes(self, genre):
+        """
+        :param genre: Name of the genre.
+        :return: Boolean array telling which nodes like the genre.
+        """
+        column = self.genres.index(genre)
+        return (self.packed_preferences[:, column // 8] >> (7 - column % 8)) & 1 == 1
+
+    @property
+    def sources(self):
+        """
+        :return: The source position of every CSR entry, i.e. the edge list is
+            `(sources, indices)`.
+        """
+        if self._sources is None:
+            self._sources = np.repeat(np.arange(len(self.nodes)), self.degree)
+        return self._sources
+
+    def positions(self, ids):
+        """
+        Maps user IDs to node positions, IDs that are not part of the graph are dropped.
+
+        :param ids: Iterable of user IDs.
+        :return: Array with the positions of the known IDs.
+        """
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        positions = np.searchsorted(self.nodes, ids)
+        positions = np.minimum(positions, len(self.nodes) - 1)
+        return positions[self.nodes[positions] == ids]
+
+    def genre_edges(self, genre):
+        """
+        Returns the directed friendships among the fans of a genre.
+
+        These are the only pairs that can transmit the virus at a concert of the genre.
+        The result is cached, so it is computed once per genre and index.
+
+        :param genre: Name of the genre.
+        :return: Tuple (sources, targets) of node positions, every friendship appears in
+            both directions.
+        """
+        if genre not in self._genre_edges:
+            if genre in self.genres:
+                likes = self.likes(genre)
+                sources = self.sources
+                mask = likes[sources] & likes[self.indices]
+                edges = (sources[mask], np.asarray(self.indices[mask]))
+            else:
+                edges = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+            self._genre_edges[genre] = edges
+        return self._genre_edges[genre]
+
+    def genre_edge_arrays(self):
+        """
+        Concatenates the `genre_edges` of all genres, e.g. to store them on disk.
+
+        :return: Tuple (sources, targets, offsets), the edges of the i-th genre are
+            `sources[offsets[i]:offsets[i + 1]]` and `targets[offsets[i]:offsets[i + 1]]`.
+        """
+        edges = [self.genre_edges(genre) for genre in self.genres]
+        offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+        np.cumsum([len(sources) for sources, _ in edges], out=offsets[1:])
+        sources = np.concatenate([sources for sources, _ in edges]).astype(np.int64)
+        targets = np.concatenate([targets for _, targets in edges]).astype(np.int64)
+        return sources, targets, offsets
+
+
+def _csr_from_edges(nodes, edges):
+    # Map the IDs to positions, drop self loops and store each friendship in both directions
+    positions = np.searchsorted(nodes, edges)
+    positions = positions[positions[:, 0] != positions[:, 1]]
+    positions = np.unique(np.sort(positions, axis=1), axis=0)
+    sources = np.concatenate([positions[:, 0], positions[:, 1]])
+    targets = np.concatenate([positions[:, 1], positions[:, 0]])
+
+    order = np.lexsort((targets, sources))
+    sources, targets = sources[order], targets[order]
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(nodes)), out=indptr[1:])
+    return indptr, targets.astype(np.int64)
+
+
+def load_graph_index(friends_file="grupee_data/friends.csv", preferences_file="grupee_data/preferences.json"):
+    """
+    Builds a graph index directly from the data files.
+
+    Like `build_social_graph`, the graph contains every user that has at least one
+    friend.
+
+    :param friends_file: CSV file with one friendship per line (after the header).
+    :param preferences_file: JSON file with the binary preference vector per user.
+    :return: The `GraphIndex`.
+    """
+    edges = np.loadtxt(friends_file, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)
+    nodes = np.unique(edges)
+    indptr, indices = _csr_from_edges(nodes, edges)
+
+    genres = list(concert_prob_per_day.keys())
+    preferences = np.zeros((len(nodes), len(genres)), dtype=bool)
+    with open(preferences_file, "r") as pref_file:
+        raw_preferences = json.load(pref_file)
+
+    ids = np.fromiter((int(id) for id in raw_preferences), dtype=np.int64, count=len(raw_preferences))
+    vectors = np.frombuffer("".join(raw_preferences.values()).encode(), dtype=np.uint8)
+    vectors = vectors.reshape(len(ids), len(genres)) == ord("1")
+    known = np.isin(ids, nodes)
+    preferences[np.searchsorted(nodes, ids[known])] = vectors[known]
+
+    return GraphIndex(nodes, indptr, indices, preferences, genres)
+
+
+def build_graph_index(G, genres=None):
+    """
+    Builds a graph index from a networkx graph.
+
+    :param G: The networkx graph (with the 'preferences' node attribute).
+    :param genres: List of genres, defaults to the genres of `concert_prob_per_day`.
+    :return: The `GraphIndex`.
+    """
+    genres = list(concert_prob_per_day.keys()) if genres is None else list(genres)
+
+    nodes = np.sort(np.fromiter((int(node) for node in G.nodes), dtype=np.int64))
+    edges = np.array([(int(u), int(v)) for u, v in G.edges], dtype=np.int64).reshape(-1, 2)
+    indptr, indices = _csr_from_edges(nodes, edges)
+
+    preferences = np.zeros((len(nodes), len(genres)), dtype=bool)
+    for position, node in enumerate(nodes):
+        node_preferences = G.nodes[node].get('preferences', {})
+        preferences[position] = [node_preferences.get(genre, 0) == 1 for genre in genres]
+
+    return GraphIndex(nodes, indptr, indices, preferences, genres)
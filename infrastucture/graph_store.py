@@ -0,0 +1,281 @@
+import json
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+import numpy as np
+
+from infrastucture.graph_index import GraphIndex
+
+ARRAYS = ("nodes", "indptr", "indices", "degree", "packed_preferences", "sources")
+GENRE_EDGE_ARRAYS = ("genre_sources", "genre_targets", "genre_offsets")
+
+
+def save_graph_store(index, path="graph_store"):
+    """
+    Writes a graph index as plain `.npy` files that can be memory-mapped.
+
+    Besides the CSR arrays, the store holds the source of every CSR entry and the
+    friendships among the fans of each genre, so processes opening the store map them
+    instead of computing private copies.
+
+    :param index: The `GraphIndex` to store.
+    :param path: Directory of the store, created if it does not exist.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(index, name)))
+    for name, array in zip(GENRE_EDGE_ARRAYS, index.genre_edge_arrays()):
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "genres.json"), "w") as genres_file:
+        json.dump(index.genres, genres_file)
+
+
+class MappedGraphIndex(GraphIndex):
+    """
+    A `GraphIndex` whose arrays are read-only memory maps of a graph store.
+
+    The operating system shares the mapped pages between all processes that open the
+    same store, so N workers need about as much memory as one. This includes the
+    per-genre friendships used by `simulate_epidemic_batch`. Pickling the index (e.g.
+    to send it to worker processes) only transfers the path, the workers map the
+    files themselves.
+
+    :ivar path: Directory of the graph store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS + GENRE_EDGE_ARRAYS
+        }
+        with open(os.path.join(path, "genres.json"), "r") as genres_file:
+            genres = json.load(genres_file)
+
+        super().__init__(
+            arrays["nodes"], arrays["indptr"], arrays["indices"], arrays["packed_preferences"], genres,
+            degree=arrays["degree"], sources=arrays["sources"]
+        )
+
+        # Slices of the mapped arrays, so the genre edges are shared as well
+        offsets = arrays["genre_offsets"]
+        for position, genre in enumerate(self.genres):
+            start, end = offsets[position], offsets[position + 1]
+            self._genre_edges[genre] = (arrays["genre_sources"][start:end], arrays["genre_targets"][start:end])
+
+    def __reduce__(self):
+        return open_graph_store, (self.path,)
+
+
+def open_graph_store(path="graph_store"):
+    """
+    Opens a graph store written by `save_graph_store` without copying it into memory.
+
+    :param path: Directory of the store.
+    :return: The `MappedGraphIndex`.
+    """
+    return MappedGraphIndex(path)
+
+
+class _Neighbors(Mapping):
+    # Neighbours of one node as {neighbour: {}} like networkx's adjacency view
+    def __init__(self, graph, position):
+        self._graph = graph
+        self._position = position
+
+    def _slice(self):
+        index = self._graph.index
+        return index.indices[index.indptr[self._position]:index.indptr[self._position + 1]]
+
+    def __getitem__(self, node):
+        if not self._graph.has_edge(self._graph.index.nodes[self._position], node):
+            raise KeyError(node)
+        return {}
+
+    def __iter__(self):
+        return iter(self._graph.index.nodes[self._slice()].tolist())
+
+    def __len__(self):
+        return int(self._graph.index.degree[self._position])
+
+
+class _Adjacency(Mapping):
+    # Node -> neighbours mapping, the `G.adj` / `G._adj` of the adaptor
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        return _Neighbors(self._graph, self._graph.position(node))
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return len(self._graph)
+
+
+class _Nodes(Mapping):
+    # Node -> attribute mapping, the `G.nodes` of the adaptor, the attributes are read-only
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        position = self._graph.position(node)
+        likes = np.unpackbits(self._graph.index.packed_preferences[position], count=len(self._graph.index.genres))
+        return MappingProxyType({"preferences": MappingProxyType(dict(zip(self._graph.index.genres, likes.tolist())))})
+
+    def __iter__(self):
+        return iter(self._graph)
+
+    def __len__(self):
+        return len(self._graph)
+
+    def __contains__(self, node):
+        return node in self._graph
+
+    def __call__(self, data=False):
+        if data:
+            return ((node, self[node]) for node in self)
+        return self
+
+    def data(self):
+        return self(data=True)
+
+
+class _Degree:
+    # Supports G.degree[node], G.degree(node), G.degree() and iterating over (node, degree)
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        return int(self._graph.index.degree[self._graph.position(node)])
+
+    def __call__(self, nbunch=None):
+        if nbunch is None:
+            return self
+        if nbunch in self._graph:
+            return self[nbunch]
+        return ((node, self[node]) for node in nbunch)
+
+    def __iter__(self):
+        return zip(self._graph.index.nodes.tolist(), self._graph.index.degree.tolist())
+
+    def __len__(self):
+        return len(self._graph)
+
+
+class _Edges:
+    # Supports iterating over G.edges, G.edges(), G.edges(nbunch, data=True), len and (u, v) in G.edges
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __call__(self, nbunch=None, data=False):
+        if nbunch is None and not data:
+            return self
+        if nbunch is None:
+            edges = iter(self)
+        else:
+            edges = self._incident([nbunch] if nbunch in self._graph else nbunch)
+        if data:
+            return ((u, v, {}) for u, v in edges)
+        return edges
+
+    def _incident(self, nodes):
+        # Like networkx, every edge among the given nodes is reported once
+        seen = set()
+        for node in nodes:
+            if node not in self._graph: continue
+            for neighbor in self._graph.adj[node]:
+                if neighbor not in seen:
+                    yield node, neighbor
+            seen.add(node)
+
+    def __iter__(self):
+        sources, targets = self._graph.index.sources, np.asarray(self._graph.index.indices)
+        upper = sources < targets
+        nodes = self._graph.index.nodes
+        return zip(nodes[sources[upper]].tolist(), nodes[targets[upper]].tolist())
+
+    def __len__(self):
+        return self._graph.number_of_edges()
+
+    def __contains__(self, edge):
+        return self._graph.has_edge(*edge)
+
+
+class SharedGraph:
+    """
+    A read-only, networkx-compatible view of a graph index.
+
+    It provides the parts of the `nx.Graph` interface used in this project (`nodes`,
+    `edges`, `degree`, `has_edge`, `neighbors`, `G[node]`, `len(G)`, `node in G` and the
+    'preferences' node attribute), so functions like `compute_centralities` accept it
+    in place of a graph built with `build_social_graph`. Node attributes are read-only
+    mappings, writing them raises a TypeError, so `simulate_epidemic` needs a real
+    graph; use `simulate_epidemic_batch` with the index instead.
+
+    :ivar index: The (usually memory-mapped) `GraphIndex`.
+    """
+    __networkx_backend__ = "networkx"
+
+    def __init__(self, index):
+        self.index = index
+        self.graph = {}
+        self.nodes = _Nodes(self)
+        self.adj = self._adj = _Adjacency(self)
+        self.degree = _Degree(self)
+        self.edges = _Edges(self)
+
+    def position(self, node):
+        """
+        :param node: A user ID.
+        :return: The position of the node in the index.
+        :raises KeyError: If the node is not part of the graph.
+        """
+        if np.ndim(node) != 0:
+            raise KeyError(node)
+        position = np.searchsorted(self.index.nodes, node)
+        if position >= len(self.index.nodes) or self.index.nodes[position] != node:
+            raise KeyError(node)
+        return int(position)
+
+    def __iter__(self):
+        return iter(self.index.nodes.tolist())
+
+    def __len__(self):
+        return len(self.index.nodes)
+
+    def __contains__(self, node):
+        try:
+            self.position(node)
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __getitem__(self, node):
+        return self.adj[node]
+
+    def is_directed(self):
+        return False
+
+    def is_multigraph(self):
+        return False
+
+    def number_of_nodes(self):
+        return len(self)
+
+    def number_of_edges(self):
+        return len(self.index.indices) // 2
+
+    def has_node(self, node):
+        return node in self
+
+    def has_edge(self, u, v):
+        if u not in self or v not in self: return False
+        neighbors = self.adj[u]._slice()
+        target = self.position(v)
+        found = np.searchsorted(neighbors, target)
+        return bool(found < len(neighbors) and neighbors[found] == target)
+
+    def neighbors(self, node):
+        return iter(self.adj[node])
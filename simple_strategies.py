@@ -1,4 +1,7 @@
+from aggregation import ReplicateAggregator
+from clustering import select_cluster_bridges
 from experiment import concert_prob_per_day
+from infrastucture.graph_index import load_graph_index
 from infrastucture.network import fill_network, Network
 from simulation import simulate_epidemic
 from vaccination import add_preferences_to_graph, attendence_prob, build_social_graph, load_friendships, \
@@ -19,7 +22,7 @@ def strategy_random_vaccination():
     sample_size = max(1, len(all_users) * 12 // 100)
     random_users = random.sample(all_users, sample_size)
 
-    return random_users
+    return [user.id for user in random_users]
 
 def strategy_most_friends():
     network = fill_network()
@@ -29,7 +32,7 @@ def strategy_most_friends():
     top_12_percent_count = max(1, len(sorted_users_by_friends) * 12 // 100)
     top_12_percent_users = sorted_users_by_friends[:top_12_percent_count]
 
-    return top_12_percent_users
+    return [user.id for user in top_12_percent_users]
 
 
 def strategy_most_genres_interested():
@@ -97,22 +100,29 @@ def strategy_most_friends_with_common_preferences_with_concert_prob():
 
     return top_12_percent_users
 
+def strategy_genre_cluster_bridges():
+    index = load_graph_index()
+
+    top_12_percent_count = max(1, len(index) * 12 // 100)
+    return select_cluster_bridges(index, top_12_percent_count, seed=0)
+
 
 def avg_and_plot(data):
-    # Get the individual classes
-    infected = np.array([run['infected'] for run in data])
-    dead = np.array([run['dead'] for run in data])
-    immune = np.array([run['immune'] for run in data])
+    # Accept a list of runs as well as an already filled aggregator
+    if not isinstance(data, ReplicateAggregator):
+        aggregator = ReplicateAggregator()
+        aggregator.add_all(data)
+        data = aggregator
 
     # Calculate mean and std for the individual classes
-    infected_mean = np.mean(infected, axis=0)
-    infected_err = np.std(infected, axis=0)
+    infected_mean = data.mean('infected')
+    infected_err = data.std('infected')
 
-    dead_mean = np.mean(dead, axis=0)
-    dead_err = np.std(dead, axis=0)
+    dead_mean = data.mean('dead')
+    dead_err = data.std('dead')
 
-    immune_mean = np.mean(immune, axis=0)
-    immune_err = np.std(immune, axis=0)
+    immune_mean = data.mean('immune')
+    immune_err = data.std('immune')
 
     # Get the time coordinate
     t = np.linspace(0, len(infected_mean), len(infected_mean))
@@ -129,6 +139,12 @@ def avg_and_plot(data):
     plt.plot(t, immune_mean, label="immune", c="blue")
     plt.errorbar(t, immune_mean, yerr=immune_err, capsize=3, fmt=" ", c="blue")
 
+    # Shade the band between the outermost tracked percentiles
+    if len(data.quantiles) > 1:
+        low, high = min(data.quantiles), max(data.quantiles)
+        for compartment, color in (('infected', "orange"), ('dead', "red"), ('immune', "blue")):
+            plt.fill_between(t, data.quantile(compartment, low), data.quantile(compartment, high), color=color, alpha=0.15)
+
     plt.legend()
     plt.show()
 
@@ -141,28 +157,27 @@ def try_strategy(ids, average_number=1):
     add_preferences_to_graph(G, preferences)
 
     print("SIMULATING:")
-    all_results = []
+    aggregator = ReplicateAggregator()
     for i in range(average_number):
         result = simulate_epidemic(G, ids, concert_prob_per_day, attendence_prob, days=200, initial_infected=81)
-        all_results.append(result)
+        print(result['dead'][len(result['dead']) - 1])
+        aggregator.add(result)
 
     # Print results
     #print_daily_results(results)
     #plot_epidemic_curves(all_results, '', save_to_file=False)
 
-    for result in all_results:
-        print(result['dead'][len(result['dead']) - 1])
-    average_last_dead = np.mean([result['dead'][-1] for result in all_results])
-    print("Average of last entries of dead:", average_last_dead)
+    print("Average of last entries of dead:", aggregator.mean_final_dead())
 
-    avg_and_plot(all_results)
+    avg_and_plot(aggregator)
 
 #try_strategy(strategy_no_vaccination(), average_number=10)
-try_strategy(strategy_random_vaccination(), average_number=20) # ~375 dead
+try_strategy(strategy_random_vaccination(), average_number=20) # ~310 dead
 #try_strategy(strategy_most_friends(), average_number=10)
 #try_strategy(strategy_most_genres_interested(), average_number=10)
 #try_strategy(strategy_friends_with_most_concert_interests(), average_number=10)
 try_strategy(strategy_most_friends_with_common_preferences(), average_number=20) # ~155 dead
 try_strategy(strategy_most_friends_with_common_preferences_with_concert_prob(), average_number=20) # ~145 dead
+#try_strategy(strategy_genre_cluster_bridges(), average_number=20)
 
 #write_vaccine_candidates_to_file(strategy_most_friends_with_common_preferences_with_concert_prob(), filename="superspreader_a_team_7.txt")
\ No newline at end of file
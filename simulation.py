@@ -1,4 +1,5 @@
 import random
+import numpy as np
 from tqdm import tqdm
 
 def simulate_epidemic(
@@ -92,3 +93,108 @@ def simulate_epidemic(
         results['susceptible'].append(len([n for n in G.nodes if G.nodes[n]['status'] == 'susceptible']))
 
     return results
+
+
+SUSCEPTIBLE, INFECTED, IMMUNE, DEAD, VACCINATED = range(5)
+
+
+def simulate_epidemic_batch(
+    index, vaccine_candidates, concert_prob, attendence_prob, days=14, initial_infected=10, replicates=1,
+    seed=None
+):
+    """
+    Simulates several independent replicates of an epidemic at once.
+
+    Follows the same rules as `simulate_epidemic` but works on a `GraphIndex` and
+    advances all replicates together with NumPy, so the graph is only prepared once.
+    As in the attendee loop of `simulate_epidemic`, every infected attendee gets one
+    chance to infect each susceptible friend, a friend is infected by the earliest
+    successful attendee in node order, and passes the virus on at the same concert
+    only if that attendee comes earlier than itself. The index orders nodes by ID, so
+    the results match `simulate_epidemic` on graphs whose nodes are in ID order.
+
+    Args:
+        index (GraphIndex): Social graph as built by `load_graph_index` or `build_graph_index`.
+        vaccine_candidates (list): List of IDs of vaccinated individuals.
+        concert_prob (dict): Probability of a concert happening per genre.
+        attendence_prob (dict): Probability of friends attending concerts based on preferences.
+        days (int): Number of days to simulate. Default is 14.
+        initial_infected (int): Number of individuals to start as infected.
+        replicates (int): Number of independent runs.
+        seed (int | np.random.SeedSequence): Seed of the random number generator.
+
+    Returns:
+        list: One dictionary per replicate tracking daily outcomes (infected, dead, immune),
+            see `simulate_epidemic`.
+    """
+    rng = np.random.default_rng(seed)
+    genres = list(concert_prob.keys())
+    genre_probs = np.array([concert_prob[genre] for genre in genres])
+    # Attendees are exactly the fans of a genre, so only friends that both like it meet
+    transmission_prob = attendence_prob[(True, True)]
+
+    positions = np.arange(len(index))
+    status = np.full((replicates, len(index)), SUSCEPTIBLE, dtype=np.int8)
+    days_infected = np.zeros((replicates, len(index)), dtype=np.int16)
+
+    # Vaccinate the proposed candidates
+    status[:, index.positions(vaccine_candidates)] = VACCINATED
+
+    # Randomly infect initial individuals
+    susceptible = np.flatnonzero(status[0] == SUSCEPTIBLE)
+    for replicate in range(replicates):
+        initial = rng.choice(susceptible, min(initial_infected, len(susceptible)), replace=False)
+        status[replicate, initial] = INFECTED
+
+    counts = np.zeros((4, replicates, days), dtype=np.int64)
+
+    for day in range(days):
+        # Simulate daily concert attendance
+        concerts = rng.random((replicates, len(genres))) < genre_probs
+        for genre_position in np.flatnonzero(concerts.any(axis=0)):
+            sources, targets = index.genre_edges(genres[genre_position])
+            if len(sources) == 0: continue
+
+            active = np.flatnonzero(concerts[:, genre_position])
+            active_status = status[active]
+            # Position of the fan that infects each fan, -1 if infected before the concert
+            infected_by = np.where(active_status == INFECTED, -1, len(index))
+            spreading = active_status == INFECTED
+            spread = spreading.copy()
+            while spreading.any():
+                # Every spreading fan gets one chance to infect each susceptible fan friend
+                exposed = spreading[:, sources] & (active_status[:, targets] == SUSCEPTIBLE)
+                rows, edges = np.nonzero(exposed)
+                hits = rng.random(len(rows)) < transmission_prob
+                rows, edges = rows[hits], edges[hits]
+
+                # Like in the attendee loop, the earliest successful fan in node order infects
+                # a fan, which then spreads too if that fan comes earlier than itself
+                np.minimum.at(infected_by, (rows, targets[edges]), sources[edges])
+                spreading = (infected_by < positions) & ~spread
+                spread |= spreading
+            active_status[(active_status == SUSCEPTIBLE) & (infected_by < len(index))] = INFECTED
+            status[active] = active_status
+
+        # Update statuses of infected nodes
+        infected = status == INFECTED
+        days_infected[infected] += 1
+        recovering = infected & (days_infected == 14)  # End of infection period
+        dying = recovering & (rng.random(status.shape) < 0.08)  # 8% chance of death
+        status[recovering] = IMMUNE
+        status[dying] = DEAD
+
+        # Record daily outcomes
+        for position, state in enumerate((INFECTED, DEAD, IMMUNE, SUSCEPTIBLE)):
+            counts[position, :, day] = np.count_nonzero(status == state, axis=1)
+
+    return [
+        {
+            'day': list(range(1, days + 1)),
+            'infected': counts[0, replicate].tolist(),
+            'dead': counts[1, replicate].tolist(),
+            'immune': counts[2, replicate].tolist(),
+            'susceptible': counts[3, replicate].tolist(),
+        }
+        for replicate in range(replicates)
+    ]
@@ -0,0 +1,182 @@
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from aggregation import ReplicateAggregator
+from experiment import concert_prob_per_day
+from simulation import simulate_epidemic_batch
+from vaccination import attendence_prob
+
+# Index shared by the worker processes, set once per worker by _init_worker
+_worker_index = None
+
+
+def scenario_grid(axes):
+    """
+    Builds every combination of the given parameter values.
+
+    Parameters are addressed as ("concert_prob", genre) or ("attendence_prob", key),
+    e.g. {("concert_prob", "Spirituality & Religion"): [60/365, 120/365],
+          ("attendence_prob", (True, True)): [0.3, 0.393]} gives four scenarios.
+
+    Args:
+        axes (dict): Parameter -> list of values.
+
+    Returns:
+        list: One dictionary of parameter overrides per scenario.
+    """
+    parameters = list(axes.keys())
+    return [dict(zip(parameters, values)) for values in itertools.product(*axes.values())]
+
+
+def latin_hypercube(bounds, n, seed=None):
+    """
+    Samples scenarios with a Latin hypercube, i.e. every parameter range is split into
+    `n` strata and each stratum is sampled exactly once.
+
+    Args:
+        bounds (dict): Parameter -> (low, high), parameters as in `scenario_grid`.
+        n (int): Number of scenarios.
+        seed (int): Seed of the random number generator.
+
+    Returns:
+        list: One dictionary of parameter overrides per scenario.
+    """
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for parameter, (low, high) in bounds.items():
+        strata = (rng.permutation(n) + rng.random(n)) / n
+        samples[parameter] = low + strata * (high - low)
+    return [{parameter: float(values[i]) for parameter, values in samples.items()} for i in range(n)]
+
+
+def apply_overrides(overrides, concert_prob=concert_prob_per_day, attendence_prob=attendence_prob):
+    """
+    Applies parameter overrides on copies of the transmission parameters.
+
+    Args:
+        overrides (dict): Parameter -> value, parameters as in `scenario_grid`.
+        concert_prob (dict): Baseline probability of a concert happening per genre.
+        attendence_prob (dict): Baseline probability of friends attending concerts.
+
+    Returns:
+        tuple: The (concert_prob, attendence_prob) of the scenario.
+
+    Raises:
+        KeyError: If a parameter is unknown or not used by `simulate_epidemic_batch`. Only
+            fans attend concerts, so the only attendance probability used is (True, True).
+    """
+    parameters = {"concert_prob": dict(concert_prob), "attendence_prob": dict(attendence_prob)}
+    for (name, key), value in overrides.items():
+        if name not in parameters or key not in parameters[name]:
+            raise KeyError(f"Unknown parameter: {(name, key)}")
+        if name == "attendence_prob" and key != (True, True):
+            raise KeyError(f"Parameter {(name, key)} is not used by simulate_epidemic_batch")
+        parameters[name][key] = value
+    return parameters["concert_prob"], parameters["attendence_prob"]
+
+
+def _parameter_column(parameter):
+    name, key = parameter
+    return f"{name}[{key}]"
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _run_batch(task):
+    scenario, seed, vaccine_candidates, concert_prob, attendence_prob, days, initial_infected, replicates = task
+    results = simulate_epidemic_batch(
+        _worker_index, vaccine_candidates, concert_prob, attendence_prob, days=days,
+        initial_infected=initial_infected, replicates=replicates, seed=seed
+    )
+    return scenario, results
+
+
+def _summarize(results):
+    rows = []
+    for result in results:
+        infected = np.asarray(result['infected'])
+        rows.append({
+            'final_dead': result['dead'][-1],
+            'final_immune': result['immune'][-1],
+            'final_susceptible': result['susceptible'][-1],
+            'peak_infected': int(infected.max()),
+            'peak_day': int(result['day'][infected.argmax()]),
+        })
+    return rows
+
+
+def run_sweep(
+    index, vaccine_candidates, scenarios, replicates=20, days=100, initial_infected=93, seed=None, n_jobs=1,
+    batch_size=None, concert_prob=concert_prob_per_day, attendence_prob=attendence_prob, aggregate=False
+):
+    """
+    Simulates every scenario several times and collects the outcomes in a tidy table.
+
+    The graph index is prepared once and shared by all scenarios. The replicates of a
+    scenario are simulated together in batches of `batch_size`, and with `n_jobs` > 1
+    the batches run in parallel worker processes that receive the index only once.
+
+    Args:
+        index (GraphIndex): Social graph as built by `load_graph_index` or `build_graph_index`.
+        vaccine_candidates (list): List of IDs of vaccinated individuals.
+        scenarios (list): Parameter overrides per scenario, see `scenario_grid` and `latin_hypercube`.
+        replicates (int): Number of runs per scenario.
+        days (int): Number of days to simulate.
+        initial_infected (int): Number of individuals to start as infected.
+        seed (int): Seed of the sweep, results are reproducible for the same seed and batch size.
+        n_jobs (int): Number of worker processes.
+        batch_size (int): Replicates simulated together, defaults to all replicates of a scenario.
+        concert_prob (dict): Baseline probability of a concert happening per genre.
+        attendence_prob (dict): Baseline probability of friends attending concerts.
+        aggregate (bool): Also feed the daily curves of every scenario into a
+            `ReplicateAggregator` as the batches finish.
+
+    Returns:
+        pd.DataFrame: One row per scenario and replicate with the parameter values and
+            the final deaths, immune, susceptible and the infection peak. With `aggregate`
+            a tuple of the table and a list with the aggregator of each scenario.
+    """
+    batch_size = replicates if batch_size is None else batch_size
+    batches = [min(batch_size, replicates - start) for start in range(0, replicates, batch_size)]
+    vaccine_candidates = np.asarray(vaccine_candidates, dtype=np.int64)
+
+    tasks = []
+    scenario_seeds = np.random.SeedSequence(seed).spawn(len(scenarios))
+    for scenario, (overrides, scenario_seed) in enumerate(zip(scenarios, scenario_seeds)):
+        scenario_concert_prob, scenario_attendence_prob = apply_overrides(overrides, concert_prob, attendence_prob)
+        for batch_seed, batch in zip(scenario_seed.spawn(len(batches)), batches):
+            tasks.append((
+                scenario, batch_seed, vaccine_candidates, scenario_concert_prob, scenario_attendence_prob, days,
+                initial_infected, batch
+            ))
+
+    rows = []
+    replicate_counts = [0] * len(scenarios)
+    aggregators = [ReplicateAggregator() for _ in scenarios] if aggregate else None
+
+    def collect(outputs):
+        # Consume the batches as they arrive, only the summaries are kept
+        for scenario, results in outputs:
+            parameters = {_parameter_column(parameter): value for parameter, value in scenarios[scenario].items()}
+            for summary in _summarize(results):
+                rows.append({'scenario': scenario, 'replicate': replicate_counts[scenario], **parameters, **summary})
+                replicate_counts[scenario] += 1
+            if aggregate:
+                aggregators[scenario].add_all(results)
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(index,)) as executor:
+            collect(executor.map(_run_batch, tasks))
+    else:
+        _init_worker(index)
+        collect(_run_batch(task) for task in tasks)
+
+    if aggregate:
+        return pd.DataFrame(rows), aggregators
+    return pd.DataFrame(rows)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from aggregation import COMPARTMENTS, ReplicateAggregator
+
+
+def make_runs(n, days=30, seed=0):
+    rng = np.random.default_rng(seed)
+    runs = []
+    for _ in range(n):
+        runs.append({
+            'day': list(range(1, days + 1)),
+            'infected': rng.poisson(100, days).tolist(),
+            'dead': np.cumsum(rng.poisson(3, days)).tolist(),
+            'immune': rng.normal(500, 50, days).tolist(),
+            'susceptible': rng.exponential(100, days).tolist(),
+        })
+    return runs
+
+
+def stack(runs, compartment):
+    return np.array([run[compartment] for run in runs])
+
+
+@pytest.mark.parametrize("n", [1, 5, 6, 10, 20, 200])
+def test_quantiles_are_exact_within_buffer(n):
+    runs = make_runs(n)
+    aggregator = ReplicateAggregator(buffer_size=200)
+    aggregator.add_all(runs)
+
+    for compartment in COMPARTMENTS:
+        values = stack(runs, compartment)
+        for q in aggregator.quantiles:
+            np.testing.assert_allclose(aggregator.quantile(compartment, q), np.quantile(values, q, axis=0))
+
+
+def test_quantiles_are_estimated_beyond_buffer():
+    runs = make_runs(3000)
+    aggregator = ReplicateAggregator()
+    aggregator.add_all(runs)
+
+    for compartment in COMPARTMENTS:
+        values = stack(runs, compartment)
+        estimates = [aggregator.quantile(compartment, q) for q in aggregator.quantiles]
+        for q, estimate in zip(aggregator.quantiles, estimates):
+            # Within the exact quantiles q ± 0.03, widened by one count for the integer data
+            low, high = np.quantile(values, [q - 0.03, q + 0.03], axis=0)
+            assert np.all((low - 1 <= estimate) & (estimate <= high + 1))
+        assert np.all(np.diff(estimates, axis=0) >= 0)
+
+
+def test_mean_std_and_final_deaths_match_numpy():
+    runs = make_runs(300)
+    aggregator = ReplicateAggregator(buffer_size=20)
+    aggregator.add_all(runs)
+
+    for compartment in COMPARTMENTS:
+        values = stack(runs, compartment)
+        np.testing.assert_allclose(aggregator.mean(compartment), values.mean(axis=0))
+        np.testing.assert_allclose(aggregator.std(compartment), values.std(axis=0))
+
+    final_dead = stack(runs, 'dead')[:, -1]
+    values, counts = aggregator.final_dead_distribution()
+    np.testing.assert_array_equal(values, np.unique(final_dead))
+    np.testing.assert_array_equal(counts, np.unique(final_dead, return_counts=True)[1])
@@ -0,0 +1,97 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+import infrastucture.experiment_store as experiment_store
+from infrastucture.experiment_store import ExperimentStore
+
+CONCERT_PROB = {'Pop': 1.0}
+ATTENDENCE_PROB = {(True, True): 0.5, (True, False): 0.0, (False, True): 0.0, (False, False): 0.0}
+
+
+def make_graph(n=30):
+    G = nx.path_graph(n)
+    for node in G.nodes:
+        G.nodes[node]['preferences'] = {'Pop': 1}
+    return G
+
+
+def make_results(days=14):
+    return {
+        'day': list(range(1, days + 1)),
+        'infected': list(range(days)),
+        'dead': [0] * days,
+        'immune': [0] * days,
+        'susceptible': list(range(days, 0, -1)),
+    }
+
+
+def simulate(store, G, seed=0, strategy=None):
+    return store.simulate(G, [5, 6], CONCERT_PROB, ATTENDENCE_PROB, days=5, initial_infected=2, seed=seed,
+                          strategy=strategy)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExperimentStore(tmp_path / "store")
+    yield store
+    store.close()
+
+
+def test_cache_hit_does_not_simulate(store, monkeypatch):
+    G = make_graph()
+    results = simulate(store, G)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The stored run should be used")
+
+    monkeypatch.setattr(experiment_store, "simulate_epidemic", fail)
+    assert simulate(store, G) == results
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:len(data) // 2],
+    lambda data: b"not a blob",
+    lambda data: b"",
+])
+def test_corrupt_blob_is_recomputed(store, corrupt):
+    G = make_graph()
+    results = simulate(store, G)
+    key = store.runs()['key'][0]
+    with open(store._blob_path(key), "rb") as blob_file:
+        data = blob_file.read()
+    with open(store._blob_path(key), "wb") as blob_file:
+        blob_file.write(corrupt(data))
+
+    assert store.get(key) is None
+    assert key not in store
+    assert simulate(store, G) == results
+    assert key in store
+
+
+def test_least_recently_used_run_is_evicted(store):
+    results = make_results()
+    store.put("first", results, "graph", "candidates", "parameters", 14, 10, 0)
+    store.max_bytes = 2 * store.total_bytes()
+    store.put("second", results, "graph", "candidates", "parameters", 14, 10, 1)
+    store.get("first")
+    store.put("third", results, "graph", "candidates", "parameters", 14, 10, 2)
+
+    assert "first" in store and "third" in store
+    assert "second" not in store
+    assert store.total_bytes() <= store.max_bytes
+
+
+def test_run_keeps_all_labels(store):
+    G = make_graph()
+    simulate(store, G, strategy="no vaccination")
+    simulate(store, G, strategy="baseline")
+
+    assert len(store) == 1
+    assert len(store.runs("no vaccination")) == 1
+    assert len(store.runs("baseline")) == 1
+
+    summary = store.compare()
+    assert sorted(summary['strategy']) == ["baseline", "no vaccination"]
+    np.testing.assert_array_equal(summary['runs'], [1, 1])
@@ -0,0 +1,41 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from infrastucture.graph_index import build_graph_index
+from simulation import simulate_epidemic, simulate_epidemic_batch
+
+CONCERT_PROB = {'Pop': 1.0}
+
+
+def make_graph():
+    # Path 0-1-2-4 plus the edge 3-2, nodes added in ID order like in the index
+    G = nx.Graph()
+    G.add_nodes_from(range(5))
+    G.add_edges_from([(0, 1), (1, 2), (2, 4), (3, 2)])
+    for node in G.nodes:
+        G.nodes[node]['preferences'] = {'Pop': 1}
+    return G
+
+
+@pytest.mark.parametrize("transmission_prob", [1.0, 0.5])
+def test_batch_matches_serial_simulation(transmission_prob):
+    G = make_graph()
+    attendence_prob = {(True, True): transmission_prob}
+
+    serial = []
+    for seed in range(2000):
+        random.seed(seed)
+        results = simulate_epidemic(G, [], CONCERT_PROB, attendence_prob, days=1, initial_infected=2)
+        serial.append(results['infected'][0])
+
+    batch = simulate_epidemic_batch(
+        build_graph_index(G, genres=['Pop']), [], CONCERT_PROB, attendence_prob, days=1, initial_infected=2,
+        replicates=20000, seed=0
+    )
+    batch = [results['infected'][0] for results in batch]
+
+    standard_error = np.sqrt(np.var(serial) / len(serial) + np.var(batch) / len(batch))
+    assert abs(np.mean(serial) - np.mean(batch)) < 4 * standard_error + 1e-9
@@ -6,6 +6,7 @@ import random
 from tqdm import tqdm
 from simulation import simulate_epidemic
 import matplotlib.pyplot as plt
+import numpy as np
 
 attendence_prob = {
     #(id1 likes, id2 likes)
@@ -90,36 +91,125 @@ def select_vaccine_candidates(G, centrality, percent=0.12):
     num_to_select = int(len(G.nodes) * percent)
     return [node for node, _ in sorted_nodes[:num_to_select]]
 
-def write_vaccine_candidates_to_file(vaccine_candidates, filename="vaccine_candidates.txt"):
+def normalize_vaccine_candidates(vaccine_candidates):
     """
-    Writes the list of vaccine candidate IDs to a text file, one ID per line.
+    Converts vaccine candidates into an integer ID array.
+
+    Some strategies return `User` objects instead of IDs, those are replaced by their ID.
+
+    Args:
+        vaccine_candidates (list | np.ndarray): User IDs or `User` objects.
+
+    Returns:
+        np.ndarray: The candidate IDs as int64 array.
+
+    Raises:
+        ValueError: If an ID is not an integer, e.g. 1.5 (which would vaccinate nobody).
+    """
+    if not isinstance(vaccine_candidates, np.ndarray):
+        vaccine_candidates = np.array([getattr(candidate, 'id', candidate) for candidate in vaccine_candidates])
+    if vaccine_candidates.size == 0 or np.issubdtype(vaccine_candidates.dtype, np.integer):
+        return vaccine_candidates.astype(np.int64, copy=False).ravel()
+
+    # Whole numbers such as 1.0 are fine, they match the node 1 of the graph
+    if not np.issubdtype(vaccine_candidates.dtype, np.floating) or \
+            not np.all(vaccine_candidates == np.round(vaccine_candidates)):
+        raise ValueError("Invalid vaccine candidates: IDs must be integers")
+    return vaccine_candidates.astype(np.int64).ravel()
+
+
+def validate_vaccine_candidates(vaccine_candidates, valid_ids=None, budget=None):
+    """
+    Checks that the vaccine candidates are usable for a simulation.
 
     Args:
-        vaccine_candidates (list): List of user IDs selected for vaccination.
+        vaccine_candidates (np.ndarray): Candidate IDs (see `normalize_vaccine_candidates`).
+        valid_ids (nx.Graph | list | np.ndarray): IDs that exist, e.g. the social graph.
+            Not checked if None.
+        budget (int): Maximum number of candidates. Not checked if None.
+
+    Raises:
+        ValueError: If IDs are unknown, duplicated or exceed the budget. The message
+            reports how many IDs are affected.
+    """
+    problems = []
+
+    unique = np.unique(vaccine_candidates)
+    if len(unique) != len(vaccine_candidates):
+        problems.append(f"{len(vaccine_candidates) - len(unique)} duplicate IDs")
+
+    if valid_ids is not None:
+        if hasattr(valid_ids, 'nodes'):
+            valid_ids = np.fromiter(valid_ids.nodes, dtype=np.int64)
+        unknown = np.count_nonzero(~np.isin(unique, np.asarray(valid_ids, dtype=np.int64)))
+        if unknown:
+            problems.append(f"{unknown} unknown IDs")
+
+    if budget is not None and len(vaccine_candidates) > budget:
+        problems.append(f"{len(vaccine_candidates)} candidates exceed the budget of {budget}")
+
+    if problems:
+        raise ValueError(f"Invalid vaccine candidates: {', '.join(problems)}")
+
+
+def write_vaccine_candidates_to_file(vaccine_candidates, filename="vaccine_candidates.txt", valid_ids=None, budget=None):
+    """
+    Writes the vaccine candidate IDs to a file.
+
+    Files ending in `.npy` are written in NumPy's binary format, which is the better
+    choice for large experiments. All other files are text files with one ID per line.
+
+    Args:
+        vaccine_candidates (list | np.ndarray): User IDs (or `User` objects) selected for vaccination.
         filename (str): Name of the output file. Defaults to "vaccine_candidates.txt".
+        valid_ids (nx.Graph | list | np.ndarray): IDs that exist, see `validate_vaccine_candidates`.
+        budget (int): Maximum number of candidates, see `validate_vaccine_candidates`.
+
+    Raises:
+        ValueError: If the candidates are invalid, nothing is written in that case.
     """
+    vaccine_candidates = normalize_vaccine_candidates(vaccine_candidates)
+    validate_vaccine_candidates(vaccine_candidates, valid_ids=valid_ids, budget=budget)
+
     try:
-        with open(filename, "w") as file:
-            for candidate in vaccine_candidates:
-                file.write(f"{candidate}\n")
-        print(f"Vaccine candidates successfully written to {filename}")
+        if filename.endswith(".npy"):
+            np.save(filename, vaccine_candidates)
+        else:
+            np.savetxt(filename, vaccine_candidates, fmt="%d")
+        print(f"{len(vaccine_candidates)} vaccine candidates successfully written to {filename}")
     except Exception as e:
         print(f"An error occurred while writing to the file: {e}")
 
-def load_vaccine_candidates(filename):
-    vaccine_candidates = []
+def load_vaccine_candidates(filename, valid_ids=None, budget=None, as_array=False):
+    """
+    Reads vaccine candidate IDs written by `write_vaccine_candidates_to_file`.
+
+    Args:
+        filename (str): Name of the file, `.npy` files are read in NumPy's binary format.
+        valid_ids (nx.Graph | list | np.ndarray): IDs that exist, see `validate_vaccine_candidates`.
+        budget (int): Maximum number of candidates, see `validate_vaccine_candidates`.
+        as_array (bool): Return an int64 array instead of a list, useful for millions of IDs.
+
+    Returns:
+        list | np.ndarray: The candidate IDs, empty if the file could not be read.
+
+    Raises:
+        ValueError: If the candidates in the file are invalid.
+    """
+    vaccine_candidates = np.empty(0, dtype=np.int64)
     try:
-        with open(filename, "r") as file:
-            while True:
-                candidate=file.readline()
-                if not candidate:
-                    break
-                print(int(candidate))
-                vaccine_candidates.append(int(candidate))
-        print(f"Vaccine candidate successfully read from {filename}")
+        if filename.endswith(".npy"):
+            vaccine_candidates = np.load(filename).astype(np.int64, copy=False)
+        else:
+            vaccine_candidates = np.loadtxt(filename, dtype=np.int64, ndmin=1)
+        print(f"{len(vaccine_candidates)} vaccine candidates successfully read from {filename}")
     except Exception as e:
         print(f"An error occured while readin the file: {e}")
-    return vaccine_candidates
+
+    validate_vaccine_candidates(vaccine_candidates, valid_ids=valid_ids, budget=budget)
+    if as_array:
+        return vaccine_candidates
+    return vaccine_candidates.tolist()
 
 def print_daily_results(results):
     for day, infected, dead, immune, susceptible in zip(
@@ -174,8 +264,8 @@ if __name__ == '__main__':
     # degree_centrality, betweenness_centrality, closeness_centrality = compute_centralities(G)
 
     # Select vaccine candidates
-    a_vaccine_candidates = load_vaccine_candidates('a_team_7.txt')
-    b_vaccine_candidates = load_vaccine_candidates('b_team_7.txt')
+    a_vaccine_candidates = load_vaccine_candidates('a_team_7.txt', valid_ids=G)
+    b_vaccine_candidates = load_vaccine_candidates('b_team_7.txt', valid_ids=G)
 
     # write_vaccine_candidates_to_file(vaccine_candidates)
 